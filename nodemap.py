@@ -5,7 +5,6 @@ NodeMap application.
 """
 import argparse
 import functools
-import itertools
 import json
 import random
 import os
@@ -15,8 +14,13 @@ from collections import defaultdict
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
-from PyQt5.QtCore import Qt, QCoreApplication, pyqtSignal, QObject, QPoint
-from PyQt5.QtGui import QIcon, QFont, QColor, QPainter, QBrush, QPixmap
+from PyQt5.QtCore import (
+    Qt, QCoreApplication, pyqtSignal, QObject, QPoint, QTimer
+)
+from PyQt5.QtGui import (
+    QIcon, QFont, QFontMetrics, QColor, QPainter, QBrush, QPixmap,
+    QPixmapCache, QStaticText, QTransform
+)
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QDesktopWidget, QMainWindow, QAction, qApp,
     QDialog, QToolTip, QPushButton, QMessageBox, QLabel,
@@ -42,6 +46,43 @@ def _abs_path(rel_path):
 app = None
 
 
+class Node:
+    """ Graph node data (position, caption and color). """
+
+    __slots__ = ('x', 'y', 'text', 'color')
+
+    def __init__(self, x, y, text='', color=(127, 127, 127)):
+        self.x = x
+        self.y = y
+        self.text = text
+        self.color = color
+
+    @classmethod
+    def from_dict(cls, value):
+        """ Create node from data loaded from a document. """
+        return cls(
+            value['x'], value['y'],
+            value.get('text', ''),
+            value.get('color', [127, 127, 127]),
+        )
+
+    def to_dict(self):
+        """ Get node data to be saved in a document. """
+        return {
+            'x': self.x,
+            'y': self.y,
+            'text': self.text,
+            'color': self.color,
+        }
+
+
+def _json_default(obj):
+    """ Serialize objects not supported by `json` (nodes and edge sets). """
+    if isinstance(obj, Node):
+        return obj.to_dict()
+    return list(obj)
+
+
 class MainApp(QApplication):
 
     icon_logo = None
@@ -64,17 +105,27 @@ class MainApp(QApplication):
         ('Cyan (G+B)', (0, 255, 255)),
     )
 
-    # Maps node IDs to node data dictionary.
+    # Maps node IDs to node data (`Node` instances).
     nodes = {}
 
     # Using `collections.defaultdict` for edges to avoid checks.
     # Default value will be empty set (no edges for this node).
+    # Edges are undirected: adjacency is always kept symmetric (if B is in
+    # `edges[A]` then A is in `edges[B]`), so it doubles as reverse index.
     edges = defaultdict(set, {})
 
+    # ID for the next created node (IDs start from 1, never reused within
+    # a session). Must be updated whenever `nodes` are replaced.
+    next_node_id = 1
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.icon_logo = QIcon(_abs_path('pixmaps/icon_32x32.xpm'))
 
+        # Standard colors are used most of the time, prepare them once.
+        for color_name, rgb in self.STD_COLORS:
+            self.get_node_colors(rgb)
+
     @functools.lru_cache(maxsize=256)
     def get_rgb_icon(self, size, rgb):
         """ Generate QIcon object filled with specified color. """
@@ -82,6 +133,15 @@ class MainApp(QApplication):
         pixmap.fill(QColor(*rgb));
         return QIcon(pixmap);
 
+    @functools.lru_cache(maxsize=256)
+    def get_node_colors(self, rgb):
+        """
+        Get (shared) pair of QColor objects for nodes of specified color:
+        the color itself and its dimmed version (used to mark selected nodes).
+
+        """
+        return QColor(*rgb), QColor(*[x // 2 for x in rgb])
+
 
 class AboutWindow(QDialog):
     """ Typical 'About' modal dialog. Nothing special. """
@@ -139,80 +199,102 @@ class NodeWidget(QtWidgets.QWidget):
     """
     SIZE = (32, 32)
 
-    color = None
-    color_dimmed = None
+    # Drag'n'drop payload (constant, only mimetype really matters).
+    _DRAG_PAYLOAD = QtCore.QByteArray(b'data string')
 
-    node_id = None
+    # Position of the last mouse press (drag start point).
+    _press_pos = None
+
+    # Node circle geometry (widget size is fixed).
+    CIRCLE_CENTER = QPoint(SIZE[0] // 2, SIZE[1] // 2)
+    CIRCLE_RADIUS = min(SIZE) // 2 - 2
+
+    # Label rendering data computed by `MainWindow._compute_label`
+    # (recomputed whenever node text changes).
+    _label_cache = None
+
+    # Widget's own circle pixmaps (see `_get_pixmap`) and device pixel
+    # ratio they were rendered for (None if they have to be updated).
+    _pm_normal = None
+    _pm_selected = None
+    _sprite_dpr = None
 
     def __init__(self, *args, **kwargs):      
         self.node_id = kwargs.pop('node_id')
         node_data = kwargs.pop('node_data')
         super().__init__(*args, **kwargs)
         
-        self.set_node_color(QColor(*node_data['color']))
+        self.set_node_color(node_data.color)
         self.initUI()
 
-    def set_node_color(self, color):
-        self.color = color
-        # Dimmed color is used to mark selected nodes.
-        self.color_dimmed = QColor(*[x // 2 for x in color.getRgb()[0:3]])
+    def set_node_color(self, rgb):
+        self._rgb = tuple(rgb)
+        self.color, self.color_dimmed = app.get_node_colors(self._rgb)
+        self._sprite_dpr = None
 
     def initUI(self):
         self.resize(*self.SIZE)
         #self.setMinimumSize(32, 32)
         
         data = app.nodes[self.node_id]
-        self.move(data['x'], data['y'])
+        self.move(data.x, data.y)
 
-        # Context menu
-        self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu);
-        self.customContextMenuRequested[QtCore.QPoint].connect(
-            self.contextMenuRequested
-        )
-        self.show()
-
-    def move(self, *args, **kwargs):
-        ret = super().move(*args, **kwargs)
-        # Update node data with new position
-        app.nodes[self.node_id]['x'] = self.pos().x()
-        app.nodes[self.node_id]['y'] = self.pos().y()
-        self.parentWidget().mark_as_unsaved()
-        return ret
+        # Note: context menu requests are dispatched by the parent window
+        # (see `MainWindow.contextMenuRequested`), widget is shown by the
+        # code that creates it.
 
     def paintEvent(self, e):
-        qp = QPainter()
-        qp.begin(self)
+        qp = QPainter(self)
         self.drawWidget(qp)
-        qp.end()
       
     def drawWidget(self, qp):
         """
         Draw the node as circle (styling depends on node's selection status).
+        The circle is rendered once and then just copied from the cache.
 
         """
-        # Prepare brush.
-        brush = QtGui.QBrush()
-        brush.setStyle(Qt.SolidPattern)
+        dpr = self.devicePixelRatioF()
+        if dpr != self._sprite_dpr:
+            bg = self.parentWidget().BACKGROUND_COLOR
+            self._pm_normal = self._get_pixmap(self._rgb, False, bg, dpr)
+            self._pm_selected = self._get_pixmap(self._rgb, True, bg, dpr)
+            self._sprite_dpr = dpr
+
         if self.is_selected():
-            # Fill selected circle with dimmed color
-            brush.setColor(self.color_dimmed)
+            qp.drawPixmap(0, 0, self._pm_selected)
         else:
-            brush.setColor(self.parentWidget().BACKGROUND_COLOR)
-        qp.setBrush(brush)
+            qp.drawPixmap(0, 0, self._pm_normal)
 
-        # Prepare pen.
-        pen = QtGui.QPen()
-        pen.setColor(self.color)
-        pen.setWidth(2);
+    @classmethod
+    def _get_pixmap(cls, rgb, selected, bg, dpr):
+        """
+        Get node circle pixmap. Pixmaps are shared by all nodes of the same
+        color via global `QPixmapCache` (rendered on cache miss).
+
+        """
+        key = 'nodemap:node:{}:{}:{}:{}'.format(rgb, selected, bg.rgb(), dpr)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+
+        pixmap = QPixmap(round(cls.SIZE[0] * dpr), round(cls.SIZE[1] * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.transparent)
+
+        color, color_dimmed = app.get_node_colors(rgb)
+        qp = QPainter(pixmap)
+        # Circle is rendered once, so it may as well be smooth.
+        qp.setRenderHint(QPainter.Antialiasing, True)
+        # Fill selected circle with dimmed color.
+        qp.setBrush(QBrush(color_dimmed if selected else bg, Qt.SolidPattern))
+        pen = QtGui.QPen(color)
+        pen.setWidth(2)
         qp.setPen(pen)
+        qp.drawEllipse(cls.CIRCLE_CENTER, cls.CIRCLE_RADIUS, cls.CIRCLE_RADIUS)
+        qp.end()
 
-        size = self.size()
-        w = size.width()
-        h = size.height()
-        center = QPoint(w // 2, h // 2)
-        radius = min(w, h) // 2 - 2
-        
-        qp.drawEllipse(center, radius, radius)
+        QPixmapCache.insert(key, pixmap)
+        return pixmap
 
     def mouseMoveEvent(self, e):
         """
@@ -221,14 +303,15 @@ class NodeWidget(QtWidgets.QWidget):
         Otherwise the app is likely to crash on reckless mouse movements.
 
         """
-        if e.buttons() != Qt.LeftButton:
+        if e.buttons() != Qt.LeftButton or self._press_pos is None:
+            return
+        # Don't start dragging on tiny mouse jitter.
+        distance = (e.pos() - self._press_pos).manhattanLength()
+        if distance < QApplication.startDragDistance():
             return
 
         mimeData = QtCore.QMimeData()
-        mimeData.setData(
-            app.NODE_MIMETYPE,
-            QtCore.QByteArray(bytes('data string', 'utf-8')),
-        )
+        mimeData.setData(app.NODE_MIMETYPE, self._DRAG_PAYLOAD)
 
         drag = QtGui.QDrag(self)
         drag.setMimeData(mimeData)
@@ -242,18 +325,22 @@ class NodeWidget(QtWidgets.QWidget):
         selected nodes).
 
         """
-        super().mousePressEvent(e)
-        if e.button() in (Qt.LeftButton, Qt.RightButton):
+        # Base class implementation is not called: it does nothing useful
+        # here besides ignoring the event.
+        if e.button() not in (Qt.LeftButton, Qt.RightButton):
+            e.ignore()
+            return
+        self._press_pos = e.pos()
 
-            modifiers = app.keyboardModifiers()
-            if modifiers != QtCore.Qt.ControlModifier:
-                self.parentWidget().clear_selection()
+        modifiers = app.keyboardModifiers()
+        if modifiers != QtCore.Qt.ControlModifier:
+            self.parentWidget().clear_selection()
 
-            if self.is_selected():
-                self.parentWidget().remove_from_selection(self.node_id)
-            else:
-                self.parentWidget().add_to_selection(self.node_id)
-            self.update()
+        if self.is_selected():
+            self.parentWidget().remove_from_selection(self.node_id)
+        else:
+            self.parentWidget().add_to_selection(self.node_id)
+        # Selection methods above schedule repaint of this widget too.
         e.accept()
 
     def is_selected(self):
@@ -261,7 +348,8 @@ class NodeWidget(QtWidgets.QWidget):
     
     def contextMenuRequested(self, point):
         """
-        Context menu triggered when user right-clicks on the node.
+        Context menu triggered when user right-clicks on the node
+        (`point` is in the node widget's coordinates).
 
         """
         menu = QtWidgets.QMenu()
@@ -272,8 +360,9 @@ class NodeWidget(QtWidgets.QWidget):
         submenu.setTitle('Change color')
         for color_name, rgb in app.STD_COLORS:
             submenu_action = submenu.addAction(color_name)
+            color, _ = app.get_node_colors(rgb)     # shared, not copied
             submenu_action.triggered.connect(
-                functools.partial(self.change_color, QColor(*rgb))
+                functools.partial(self.change_color, color)
             )
             submenu_action.setIcon(app.get_rgb_icon((32, 32), rgb))
         submenu.addSeparator()
@@ -290,12 +379,16 @@ class NodeWidget(QtWidgets.QWidget):
         text, ok = QInputDialog.getText(
             self, 'Rename',
             'Enter new name for node (#%s):' % self.node_id,
-            text=node_data['text']
+            text=node_data.text
         )
         if ok:
-            app.nodes[self.node_id]['text'] = text
+            node_data.text = text
         self.parentWidget().mark_as_unsaved()
-        self.parentWidget().update()
+        self.parentWidget().update(
+            self.parentWidget()._node_influence_rect(
+                self.node_id, include_edges=False
+            )
+        )
     
     def change_color(self, color=None):
         node_data = app.nodes[self.node_id]
@@ -308,37 +401,41 @@ class NodeWidget(QtWidgets.QWidget):
         if color == self.color:
             return
 
-        app.nodes[self.node_id]['color'] = [
-            color.red(), color.green(), color.blue()
-        ]
-        self.set_node_color(color)
+        node_data.color = [color.red(), color.green(), color.blue()]
+        self.set_node_color(color.getRgb()[0:3])
 
         # This color will be used when creating the next node.
         self.parentWidget().last_color = color
 
         self.parentWidget().mark_as_unsaved()
-        self.parentWidget().update()
+        # Only the circle itself changes (labels and edges don't depend on
+        # node color).
+        self.update()
         
     def delete(self):
         node_data = app.nodes[self.node_id]
         reply = QMessageBox.question(self,
             'Confirmation',
             'Are you sure you want to delete node "{}" (id={})?'.format(
-                node_data['text'], self.node_id
+                node_data.text, self.node_id
             ),
             QMessageBox.Yes | QMessageBox.No, QMessageBox.No
         )
+        # Area to repaint has to be determined before the node is gone.
+        dirty_rect = self.parentWidget()._node_influence_rect(self.node_id)
         if reply == QMessageBox.Yes:
+            self.parentWidget().remove_from_selection(self.node_id)
             del app.nodes[self.node_id]
-            del app.edges[self.node_id]
-            for v in app.edges.values():
-                v.discard(self.node_id)
+            # Only incident edges are touched (adjacency is symmetric).
+            for other_id in app.edges.pop(self.node_id, ()):
+                app.edges[other_id].discard(self.node_id)
             del self.parentWidget().nodes[self.node_id]
+            self.parentWidget().invalidate_edges()
             self.close()
             self.destroy()
 
         self.parentWidget().mark_as_unsaved()
-        self.parentWidget().update()
+        self.parentWidget().update(dirty_rect)
 
 
 class MainWindow(QMainWindow):
@@ -352,6 +449,10 @@ class MainWindow(QMainWindow):
     """
     NODE_LABEL_MAX_WIDTH = 200      # max pixels
     NODE_LABEL_MAX_LENGTH = 32      # max characters (otherwise truncated)
+    # Labels longer than this are truncated, keeping that many characters
+    # (so that the label along with "..." fits NODE_LABEL_MAX_LENGTH).
+    _LABEL_TRUNCATE_LENGTH = NODE_LABEL_MAX_LENGTH - 3
+    _LABEL_KEEP_LENGTH = NODE_LABEL_MAX_LENGTH - 4
     BACKGROUND_COLOR = QColor(8, 8, 8)
 
     # Opened file name (or None)
@@ -360,18 +461,26 @@ class MainWindow(QMainWindow):
     browse_dir = os.getenv('HOME')
 
     unsaved_changes = False
+    # Window title update is already scheduled (see `mark_as_unsaved`).
+    _dirty_pending = False
 
     # This color will be updated on node color change
     # and used for new nodes by default.
     last_color = QColor(127, 127, 127)
 
-    actions = {}
-    selected_nodes = set()
-
-    nodes = {}      # maps node IDs to actual widget instances
+    # Cached edge lines and their bounding rects as `(lines, rects)` pair of
+    # lists (or None if the cache has to be rebuilt, see `invalidate_edges`).
+    _edge_lines = None
 
     def __init__(self):
         super().__init__()
+        # Mutable state is per instance (class attributes would be shared
+        # by all windows).
+        self.actions = {}
+        self.selected_nodes = set()
+        self.nodes = {}     # maps node IDs to actual widget instances
+        # Scratch rect reused when rendering node labels.
+        self._label_rect = QtCore.QRect()
         self.initUI()
 
     def mousePressEvent(self, e):
@@ -386,7 +495,6 @@ class MainWindow(QMainWindow):
             modifiers = app.keyboardModifiers()
             if modifiers != QtCore.Qt.ControlModifier:
                 self.clear_selection()
-                self.update()
 
     def _update_statusbar_on_selection(self):
         if not self.selected_nodes:
@@ -394,21 +502,65 @@ class MainWindow(QMainWindow):
         else:
             msg = 'Selected nodes ({} total): {}.'.format(
                 len(self.selected_nodes),
-                ', '.join(['#%d' % x for x in self.selected_nodes])
+                ', '.join('#%d' % x for x in self.selected_nodes)
             )
-        self.statusBar().showMessage(msg)
+        self.show_status(msg)
+
+    def show_status(self, msg):
+        """
+        Show message in the status bar. Actual update is deferred (and
+        throttled), so it's cheap to call it from mouse event handlers.
+
+        """
+        self._pending_status = msg
+        if not self._status_throttle.isActive():
+            self._status_throttle.start()
+
+    def _apply_status_text(self):
+        self._status_label.setText(self._pending_status)
+
+    def _node_influence_rect(self, node_id, include_edges=True):
+        """
+        Get the area of the window affected by the node: the node widget,
+        its label and (optionally) all incident edges.
+
+        """
+        node_rect = self.nodes[node_id].geometry()
+        # Label is never wider than NODE_LABEL_MAX_WIDTH (see
+        # `draw_node_labels`).
+        rect = node_rect.united(QtCore.QRect(
+            node_rect.x() + (node_rect.width() - self.NODE_LABEL_MAX_WIDTH) // 2,
+            node_rect.bottom() + 4,
+            self.NODE_LABEL_MAX_WIDTH, self._label_height
+        ))
+        if not include_edges:
+            return rect
+
+        center = node_rect.center()
+        for other_id in app.edges.get(node_id, ()):
+            other_center = self.nodes[other_id].geometry().center()
+            # Margins account for the pen width.
+            rect = rect.united(QtCore.QRect(
+                center, other_center
+            ).normalized().adjusted(-2, -2, 2, 2))
+        return rect
 
     def add_to_selection(self, node_id):
         self.selected_nodes.add(node_id)
         self._update_statusbar_on_selection()
-        self.update()
+        # Selection only changes the node circle and its label.
+        self.update(self._node_influence_rect(node_id, include_edges=False))
 
     def remove_from_selection(self, node_id):
         self.selected_nodes.discard(node_id)
         self._update_statusbar_on_selection()
-        self.update()
+        self.update(self._node_influence_rect(node_id, include_edges=False))
     
     def clear_selection(self):
+        for node_id in self.selected_nodes:
+            self.update(
+                self._node_influence_rect(node_id, include_edges=False)
+            )
         self.selected_nodes.clear()
         self._update_statusbar_on_selection()
 
@@ -460,7 +612,18 @@ class MainWindow(QMainWindow):
             APPLICATION_NAME))
 
     def mark_as_unsaved(self):
+        """
+        Set "unsaved changes" flag. Window title update is deferred, so bursts
+        of changes (e.g. on file load) result in a single title update.
+
+        """
         self.unsaved_changes = True
+        if not self._dirty_pending:
+            self._dirty_pending = True
+            QTimer.singleShot(50, self._flush_dirty)
+
+    def _flush_dirty(self):
+        self._dirty_pending = False
         self.update_window_title()
 
     def initUI(self):
@@ -473,6 +636,21 @@ class MainWindow(QMainWindow):
         # Set a font used to render all tooltips.
         QToolTip.setFont(QFont('SansSerif', 10))
 
+        # Fonts used to render node labels (selected nodes' labels are bold).
+        self._label_font = QFont(self.font())
+        self._label_font.setPointSize(10)
+        self._label_font_bold = QFont(self._label_font)
+        self._label_font_bold.setBold(True)
+        self._label_metrics = QFontMetrics(self._label_font)
+        self._label_metrics_bold = QFontMetrics(self._label_font_bold)
+        # Height of the label strip below the node (fits any label).
+        self._label_height = max(
+            self._label_metrics.height(), self._label_metrics_bold.height()
+        )
+
+        # Pen used to render edges.
+        self._edge_pen = QtGui.QPen(Qt.gray, 2, Qt.SolidLine)
+
         # Window size and position
         self.resize(640, 480)
         self.center()
@@ -566,7 +744,13 @@ class MainWindow(QMainWindow):
             "color: rgb(0, 0, 0);"
         )
         self.setStatusBar(bar)
-        self.statusBar().showMessage('Ready.')
+        self._status_label = QLabel()
+        bar.addWidget(self._status_label, 1)
+        self._status_throttle = QTimer(self)
+        self._status_throttle.setSingleShot(True)
+        self._status_throttle.setInterval(50)
+        self._status_throttle.timeout.connect(self._apply_status_text)
+        self.show_status('Ready.')
 
         # Context menu
         self.setContextMenuPolicy(QtCore.Qt.CustomContextMenu);
@@ -581,67 +765,147 @@ class MainWindow(QMainWindow):
         self.show()
 
     def initialize_nodes(self):
-        for node_id, node_data in app.nodes.items():
-            widget = NodeWidget(self, node_id=node_id, node_data=node_data) 
-            self.nodes[node_id] = widget
+        """
+        Synchronize node widgets with `app.nodes`: widgets of existing nodes
+        are reused, missing ones are created and obsolete ones destroyed.
+
+        """
+        # Updates are disabled while creating widgets, so the window gets
+        # repainted once rather than once per node.
+        self.setUpdatesEnabled(False)
+        try:
+            for node_id in self.nodes.keys() - app.nodes.keys():
+                node_widget = self.nodes.pop(node_id)
+                node_widget.close()
+                node_widget.destroy()
+            self.selected_nodes.intersection_update(app.nodes)
+
+            for node_id, node_data in app.nodes.items():
+                node_widget = self.nodes.get(node_id)
+                if node_widget is None:
+                    node_widget = NodeWidget(
+                        self, node_id=node_id, node_data=node_data
+                    )
+                    node_widget.show()
+                    self.nodes[node_id] = node_widget
+                else:
+                    node_widget.move(node_data.x, node_data.y)
+                    node_widget.set_node_color(node_data.color)
+        finally:
+            # Note: this schedules repaint of the whole window.
+            self.setUpdatesEnabled(True)
+        self.invalidate_edges()
 
     def dragEnterEvent(self, e):
         """
-        If we ignore wrong content types here we will have troubles with them
-        in `dropEvent` handler. So be it by now (some arcane wizardry here).
+        Accept only dragged nodes, so that the window doesn't process
+        unrelated drags at all.
 
         """
-        # TODO: Do it properly.
         # TODO: Redraw widget while dragging.
-        e.accept()
+        if e.mimeData().hasFormat(app.NODE_MIMETYPE):
+            e.acceptProposedAction()
+        else:
+            e.ignore()
 
     def dropEvent(self, e):
         # Ignore objects with unsupported content-type.
-        data = e.mimeData().data(app.NODE_MIMETYPE).data().decode('utf-8')
-        if not data:
+        if not e.mimeData().hasFormat(app.NODE_MIMETYPE):
             e.ignore()
-            return  
+            return
+
+        node_id = e.source().node_id
+        # Repaint the area around both old and new node positions.
+        self.update(self._node_influence_rect(node_id))
 
         # Actually move the node (place center on the widget under cursor)
         size = e.source().size()
-        e.source().move(
-            e.pos().x() - size.width() // 2,
-            e.pos().y() - size.height() // 2
-        )
+        x = e.pos().x() - size.width() // 2
+        y = e.pos().y() - size.height() // 2
+        e.source().move(x, y)
         e.setDropAction(Qt.MoveAction)
 
-        self.update()
+        # Update node data with new position.
+        node_data = app.nodes[node_id]
+        node_data.x = x
+        node_data.y = y
+        self.invalidate_edges()
+        self.mark_as_unsaved()
+
+        self.update(self._node_influence_rect(node_id))
         
         # Show new coordinates in status bar.
-        self.statusBar().showMessage('Moved node {} to ({}, {}).'.format(
+        self.show_status('Moved node {} to ({}, {}).'.format(
             e.source().node_id, e.pos().x(), e.pos().y()
         ))
 
         e.accept()
 
     def paintEvent(self, event):
-        qp = QPainter()
-        qp.begin(self)
+        # Note: painting is clipped to the exposed region by Qt itself, edges
+        # and labels are culled against it just to save some work.
+        qp = QPainter(self)
+        # Straight edge lines don't need antialiasing (which is costly),
+        # labels do.
+        qp.setRenderHint(QPainter.Antialiasing, False)
         self.draw_edges(event, qp)
+        qp.setRenderHint(QPainter.TextAntialiasing, True)
         self.draw_node_labels(event, qp)
-        qp.end()
 
-    def draw_edges(self, event, qp):
-        pen = QtGui.QPen(Qt.gray, 2, Qt.SolidLine)
+    def invalidate_edges(self):
+        """ Drop cached edge geometry (call it when nodes or edges change). """
+        self._edge_lines = None
 
-        qp.setPen(pen)
+    def _build_edge_lines(self):
+        # Node widgets have fixed size, so centers are just shifted positions.
+        # Positions are taken from node data (kept in sync with widgets),
+        # which is cheaper than querying widgets.
+        half_w = NodeWidget.SIZE[0] // 2
+        half_h = NodeWidget.SIZE[1] // 2
+        nodes = app.nodes
 
+        lines = []
+        rects = []
         for src_id, trg_ids in app.edges.items():
-            src_rect = self.nodes[src_id].geometry()
-            src_x = src_rect.x() + src_rect.width() // 2
-            src_y = src_rect.y() + src_rect.height() // 2
-
+            src_data = nodes[src_id]
+            src_x = src_data.x + half_w
+            src_y = src_data.y + half_h
             for trg_id in trg_ids:
-                trg_rect = self.nodes[trg_id].geometry()
-                trg_x = trg_rect.x() + trg_rect.width() // 2
-                trg_y = trg_rect.y() + trg_rect.height() // 2
+                # Each edge is stored both ways but has to be drawn once
+                # (loops, if any, are degenerate and not drawn at all).
+                if trg_id <= src_id:
+                    continue
+                trg_data = nodes[trg_id]
+                trg_x = trg_data.x + half_w
+                trg_y = trg_data.y + half_h
+                lines.append(QtCore.QLineF(src_x, src_y, trg_x, trg_y))
+                # Margins account for the pen width.
+                rects.append(QtCore.QRect(
+                    QPoint(src_x, src_y), QPoint(trg_x, trg_y)
+                ).normalized().adjusted(-2, -2, 2, 2))
+        return lines, rects
 
-                qp.drawLine(src_x, src_y, trg_x, trg_y)
+    def draw_edges(self, event, qp):
+        if self._edge_lines is None:
+            self._edge_lines = self._build_edge_lines()
+
+        lines, rects = self._edge_lines
+        region = event.region()
+        # Skip edges lying completely outside of the exposed region (cached
+        # list is used as is when the whole window is repainted). Region is
+        # checked rather than its bounding rect since it may consist of
+        # distant parts (e.g. old and new position of a moved node).
+        if region.rectCount() > 1 or not event.rect().contains(self.rect()):
+            lines = [
+                line for line, bbox in zip(lines, rects)
+                if region.intersects(bbox)
+            ]
+        if not lines:
+            return
+
+        qp.setPen(self._edge_pen)
+        # All edges are drawn with a single call.
+        qp.drawLines(lines)
         
     def draw_node_labels(self, event, qp):
         '''
@@ -649,57 +913,100 @@ class MainWindow(QMainWindow):
         (text labels are rendered separately from node widgets themselves).
 
         '''
-        font = qp.font()
-        font.setPointSize(10)
+        exposed = event.region()
+
+        # Selected nodes' labels are rendered bold. Labels are drawn in two
+        # passes (regular, then selected), so the font and pen are switched
+        # only twice per paint.
+        qp.setFont(self._label_font)
+        qp.setPen(Qt.gray)
+        for node_id, node_widget in self.nodes.items():
+            if node_id not in self.selected_nodes:
+                self._draw_node_label(qp, exposed, node_id, node_widget)
 
+        qp.setFont(self._label_font_bold)
+        qp.setPen(Qt.white)
         for node_id, node_widget in self.nodes.items():
+            if node_id in self.selected_nodes:
+                self._draw_node_label(
+                    qp, exposed, node_id, node_widget, bold=True
+                )
+
+    def _draw_node_label(self, qp, exposed, node_id, node_widget,
+                         bold=False):
+        """ Draw single node label (font and pen are set by the caller). """
+        node_data = app.nodes[node_id]
+        label = node_widget._label_cache
+        if label is None or label[0] != node_data.text:
+            label = self._compute_label(node_id)
+        label_text = label[1]
+        # Width and static text are prepared for specific font.
+        label_width, static_text = label[3] if bold else label[2]
+
+        # Limit max widget width according to actual text width.
+        widget_width = min(label_width, self.NODE_LABEL_MAX_WIDTH)
+
+        # Place the label below the node widget, symmetrically (node data
+        # position matches the widget's one, and widget size is fixed).
+        # Single scratch rect is reused for all labels.
+        x = node_data.x + (NodeWidget.SIZE[0] - widget_width) // 2
+        y = node_data.y + NodeWidget.SIZE[1] + 3
+        rect = self._label_rect
+        rect.setRect(x, y, widget_width, self._label_height)
+        if not exposed.intersects(rect):
+            return
 
-            # Selected nodes' labels are rendered bold. Choosing the font here.
-            if node_widget.is_selected():
-                font.setBold(True)
-                qp.setPen(Qt.white)
-            else:
-                font.setBold(False)
-                qp.setPen(Qt.gray)
-            qp.setFont(font)
-            
-            # Limit max label size (truncate and append "..." if necessary)
-            label_text = app.nodes[node_id]['text']
-            if len(label_text) > self.NODE_LABEL_MAX_LENGTH-3:
-                label_text = "%s..." % label_text[:self.NODE_LABEL_MAX_LENGTH-4]
+        # Render. Labels fitting max width are drawn with cached glyph
+        # layout, wider ones have to be clipped by `drawText`.
+        if label_width <= widget_width:
+            qp.drawStaticText(x, y, static_text)
+        else:
+            # If label is truncated then it should be aligned left, not
+            # center (otherwise we will only see the middle part of it).
+            qp.drawText(rect, Qt.AlignLeft, label_text)
+    
+    def _compute_label(self, node_id):
+        """
+        Compute (and cache in the node widget) label text along with its
+        width and `QStaticText` (glyph layout) for both regular and bold
+        fonts. Original node text is stored as well, so that the cache can
+        be checked for being up to date.
 
+        """
+        # Limit max label size (truncate and append "..." if necessary)
+        text = label_text = app.nodes[node_id].text
+        if len(label_text) > self._LABEL_TRUNCATE_LENGTH:
+            label_text = label_text[:self._LABEL_KEEP_LENGTH] + '...'
+
+        label = [text, label_text]
+        for font, metrics in (
+            (self._label_font, self._label_metrics),
+            (self._label_font_bold, self._label_metrics_bold),
+        ):
+            static_text = QStaticText(label_text)
+            # Labels are plain text (like with `drawText`), never markup.
+            static_text.setTextFormat(Qt.PlainText)
+            static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+            static_text.prepare(QTransform(), font)
             # Determine actual text width via "font metrics".
-            # Limit max widget width accordingly.
-            metrics = qp.fontMetrics()
-            label_width = metrics.width(label_text)
-            widget_width = min(label_width, self.NODE_LABEL_MAX_WIDTH)
-
-            # Place the label below the node widget, symmetrically.
-            node_rect = node_widget.geometry()
-            x = node_rect.x()
-            y = node_rect.y()
-            rect = QtCore.QRect(
-                node_rect.x() + (node_rect.width() - widget_width) // 2,
-                node_rect.bottom() + 4,
-                widget_width, 16
-            )
+            label.append((metrics.horizontalAdvance(label_text), static_text))
 
-            # If label is truncated then it should be aligned left, not center
-            # (otherwise we will only see the middle part of the label).
-            if label_width < widget_width:
-                alignment = Qt.AlignCenter
-            else:
-                alignment = Qt.AlignLeft
+        label = tuple(label)
+        self.nodes[node_id]._label_cache = label
+        return label
 
-            # Render
-            qp.drawText(rect, alignment, label_text)
-    
     def contextMenuRequested(self, point):
         """
         Context menu triggered when user right-clicks somewhere in the empty
-        space of the main window.
+        space of the main window. Node widgets don't handle context menu
+        requests themselves, so requests for nodes are dispatched from here.
 
         """
+        child = self.childAt(point)
+        if isinstance(child, NodeWidget):
+            child.contextMenuRequested(child.mapFrom(self, point))
+            return
+
         menu = QtWidgets.QMenu()
         action1 = menu.addAction('Add node...')
         action1.triggered.connect(lambda: self.add_node(point))
@@ -707,58 +1014,69 @@ class MainWindow(QMainWindow):
 
     def add_node(self, point):
 
-        # Poor man's autoincrement.
-        node_id = max(app.nodes.keys() or [0]) + 1 
+        node_id = app.next_node_id
+        app.next_node_id += 1
 
-        app.nodes[node_id] = {
-            'text': 'Node %s' % node_id,
-            'x': point.x(),
-            'y': point.y(),
-            'color': list(self.last_color.getRgb()[0:3])
-        }
+        app.nodes[node_id] = Node(
+            point.x(), point.y(),
+            text='Node %s' % node_id,
+            color=list(self.last_color.getRgb()[0:3]),
+        )
         app.edges[node_id] = set()
         widget = NodeWidget(self, node_id=node_id, node_data=app.nodes[node_id]) 
+        widget.show()
         self.nodes[node_id] = widget
+        self.invalidate_edges()
         
         self.mark_as_unsaved()
-        self.update()
+        self.update(self._node_influence_rect(node_id, include_edges=False))
+
+    def _selection_rect(self):
+        """
+        Get the area covering all selected nodes along with their labels
+        (and thus all edges between them).
+
+        """
+        rect = QtCore.QRect()
+        for node_id in self.selected_nodes:
+            rect = rect.united(
+                self._node_influence_rect(node_id, include_edges=False)
+            )
+        return rect
 
     def connect_nodes(self):
         """ Connect all selected nodes. """
-        for src_id, trg_id in itertools.product(self.selected_nodes, repeat=2):
-            if src_id != trg_id:
-                app.edges[src_id].add(trg_id)
+        # Adjacency stays symmetric since every selected node gets all
+        # the others as neighbors.
+        for src_id in self.selected_nodes:
+            app.edges[src_id].update(self.selected_nodes)
+            app.edges[src_id].discard(src_id)     # no loops
+        self.invalidate_edges()
         self.mark_as_unsaved()
-        self.update()
+        self.update(self._selection_rect())
 
     def disconnect_nodes(self):
         """ Disconnect all selected nodes. """
-        for src_id, trg_id in itertools.product(self.selected_nodes, repeat=2):
-            if src_id != trg_id:
-                # `discard` ignores non-existing elements (unlike `remove`)
-                app.edges[src_id].discard(trg_id)
+        for src_id in self.selected_nodes:
+            # Ignores non-existing elements (like `discard`).
+            app.edges[src_id].difference_update(self.selected_nodes)
+        self.invalidate_edges()
         self.mark_as_unsaved()
-        self.update()
+        self.update(self._selection_rect())
 
     def new(self):
         if not self.confirm_unsaved_changes():
             return
 
-        for node_widget in self.nodes.values():
-            node_widget.close()
-            node_widget.destroy()
-        
-        self.nodes = {}
-
         app.nodes = {}
         app.edges = defaultdict(set, {})
+        app.next_node_id = 1
+        self.initialize_nodes()
        
         self.filename = None
         self.unsaved_changes = False
         self.update_window_title()
 
-        self.update()
-
     def open(self, filename):
         if not self.confirm_unsaved_changes():
             return
@@ -782,35 +1100,31 @@ class MainWindow(QMainWindow):
                 if reply != QMessageBox.Yes:
                     return
 
-            def _get_node_data(value):
-                return {
-                    'x': value['x'],
-                    'y': value['y'],
-                    'text': value.get('text', ''),
-                    'color': value.get('color', [127, 127, 127]),
-                }
             app.nodes = {
-                int(k): _get_node_data(v)
+                int(k): Node.from_dict(v)
                 for k, v in data['nodes'].items()
             }
-            app.edges = defaultdict(
-                set, {int(k): set(v) for k, v in data['edges'].items()}
-            )
+            app.next_node_id = max(app.nodes, default=0) + 1
+            # JSON object keys are always strings, so node IDs have to be
+            # converted back. Adjacency is made symmetric (and loops are
+            # dropped) in the same pass in case the file lacks some of the
+            # reverse edges.
+            app.edges = defaultdict(set, {})
+            for k, v in data['edges'].items():
+                src_id = int(k)
+                app.edges[src_id].update(v)
+                for trg_id in v:
+                    app.edges[trg_id].add(src_id)
+                app.edges[src_id].discard(src_id)
 
-            for node_widget in self.nodes.values():
-                node_widget.close()
-                node_widget.destroy()
-
-            self.nodes = {}
             self.initialize_nodes()
 
             self.filename = filename
             self.browse_dir = os.path.dirname(filename)
             self.unsaved_changes = False
 
+            # Note: repaint is already scheduled by `initialize_nodes`.
             self.update_window_title()
-
-            self.update()
         print('Opened file: %s' % filename)
 
     def save(self):
@@ -820,11 +1134,13 @@ class MainWindow(QMainWindow):
 
         data = {
             'nodes': app.nodes,
-            'edges': {k: list(v) for k,v in app.edges.items()},
+            'edges': app.edges,
             'version': VERSION,
         }
+        # One-shot `json.dumps` uses the C encoder (`json.dump` does not).
+        # Nodes and edge sets are converted via `default`.
         with open(self.filename, 'w') as f:
-            json.dump(data, f)
+            f.write(json.dumps(data, default=_json_default))
 
         self.unsaved_changes = False
         